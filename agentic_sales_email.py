@@ -1,20 +1,129 @@
-# pip install sendgrid openai-agents
+# requires Python 3.11+ (asyncio.TaskGroup)
+# pip install "httpx[http2]" openai-agents orjson
+# pip install uvloop  # optional, faster event loop on Linux/macOS
 from dotenv import load_dotenv
-from agents import Agent, Runner, trace, function_tool
-from typing import Dict
-import sendgrid
+from agents import Agent, Runner, trace, set_default_openai_client
+from openai import AsyncOpenAI
+from typing import Dict, List, Tuple
+import argparse
+import httpx
+import orjson
 import os
+import sys
 import asyncio
-from sendgrid.helpers.mail import Mail, Email, To, Content
+
+try:
+    import uvloop
+except ImportError:  # optional; not available on Windows
+    uvloop = None
 
 load_dotenv(override=True)
 
 # --------------------- configuration variables ---------------------
 llm_model = "gpt-4o-mini"
-sender_email = os.environ["SENDER_EMAIL"]
-receiver_email = os.environ["RECEIVER_EMAIL"]
+# SENDER_EMAIL, RECEIVER_EMAIL and SENDGRID_API_KEY are only needed for sending, so
+# they are read when a send happens and --offline drafting works without them
+sender_email = os.environ.get("SENDER_EMAIL", "")
+sendgrid_send_url = "https://api.sendgrid.com/v3/mail/send"
+sendgrid_max_personalizations = 1000  # SendGrid limit per mail/send request
+max_concurrent_llm_calls = 8  # cap on in-flight OpenAI requests (rate limits)
+max_concurrent_sends = 4  # cap on in-flight SendGrid requests (rate limits)
+batch_poll_seconds = 60  # how often to check on an offline Batch API job
+
+# --------------------- OpenAI client -------------------------
+# one pooled HTTP/2 client shared by every agent, so concurrent runs reuse connections
+openai_http_client = httpx.AsyncClient(http2=True,
+                                       limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                                       timeout=httpx.Timeout(60.0))
+openai_client = AsyncOpenAI(http_client=openai_http_client)
+set_default_openai_client(openai_client)
 
 # --------------------- instruction prompts -------------------------
+# Shared, static preamble placed at the head of every agent's instructions. OpenAI caches prompt prefixes
+# of 1024+ tokens automatically, so keeping this text identical (and first) across all agents and runs lets
+# repeated calls reuse the cached prefix. Edit with care: any change invalidates the cache.
+company_preamble = """
+# About idare.ai
+idare.ai provides a zero-code predictive analytics solution powered by AI. Business and technical teams connect 
+their existing data (for example, tables stored in AWS S3 or exported from their warehouse), pick the outcome they 
+want to predict, and idare.ai's AutoML platform prepares the data, trains and compares candidate models, and 
+explains the results — without anyone writing code. Typical use cases include customer churn prediction, demand and 
+sales forecasting, lead scoring, credit and risk scoring, predictive maintenance, and inventory planning.
+
+# Who we sell to
+Our buyers are decision makers who own data, analytics or technology budgets: CTOs, CIOs, heads of data, analytics 
+and BI leads, and operations or revenue leaders who depend on forecasts. They are busy, receive many cold emails 
+every day, and respond to messages that are relevant to their role and respectful of their time. They care about:
+- Time to value: getting a working predictive model in days rather than months.
+- Team leverage: letting analysts and domain experts build models without waiting on a scarce data science team.
+- Trust: understanding why a model makes a prediction, and keeping control over their own data.
+- Cost: avoiding large upfront projects, consultants, or new headcount to get started.
+
+# Our value proposition
+- Zero code: the full workflow, from data upload to deployed prediction, runs through a guided interface.
+- Automated machine learning: the platform handles feature preparation, model selection and tuning.
+- Explainability: every model comes with clear explanations of the drivers behind its predictions.
+- Works with existing data: connect to data where it already lives instead of moving it into a new system.
+- Fast pilots: a first use case can usually be evaluated quickly on the customer's own data.
+
+# Rules that apply to every message
+- Be truthful. Never invent customers, case studies, statistics, awards, prices, discounts, or guarantees. If a 
+  specific number or reference would help, leave it out rather than make it up.
+- Address the recipient exactly as given in the request (name, title, salutation) and sign with the sender name 
+  and role exactly as given. Never invent contact details, phone numbers, or links.
+- Write in clear, plain English. Avoid jargon the reader would not use themselves, buzzword chains, and hype.
+- One email has one goal: a low-friction next step, such as a short introductory call or a reply. Ask for it once, 
+  clearly, near the end.
+- Keep the focus on the recipient's problems and outcomes, not on idare.ai's features for their own sake.
+- Do not use placeholders such as [Company] or [Your Name] in the final text; write complete sentences instead.
+- Do not include subject lines, headers, or commentary inside an email body unless explicitly asked to.
+- Respect the reader: no false urgency, no guilt, no pressure tactics, and no claims that a prior conversation or 
+  relationship exists when it does not.
+
+# What a good cold email looks like
+- Opening: one or two sentences that show why this message is relevant to this person and their role.
+- Problem: a short, recognisable description of a challenge teams like theirs face with predictive analytics, such 
+  as slow model delivery, a backlog of data requests, or forecasts built in spreadsheets.
+- Solution: how idare.ai addresses that challenge, in one to three sentences, tied back to the reader's outcome.
+- Call to action: a single, specific, easy next step.
+- Sign-off: sender name and role.
+Shorter is usually better; most effective cold emails are under 150 words.
+
+# Writing styles used by the sales agents
+- Professional: formal, precise and credible. Short paragraphs, measured language, a clear business rationale, and 
+  a courteous call to action. Suited to senior executives in conservative industries.
+- Witty: warm, light and memorable. A playful opening line or gentle humour that relates to the reader's world, 
+  while still making the business point clearly. Humour must never be sarcastic, mocking, or at anyone's expense.
+- Concise: direct and minimal. Three to five short sentences that state the problem, the solution and the ask, 
+  with nothing else. Suited to readers who skim email on their phone between meetings.
+When judging drafts, prefer the one most likely to earn a reply from this specific recipient: relevant opening, 
+clear value, credible tone, one simple ask, and no rule violations. Length and style are secondary to relevance.
+
+# Subject line guidance
+- Short: ideally under eight words, and never more than about 60 characters.
+- Specific and honest: reflect what the email actually says. No clickbait, no "Re:" or "Fwd:" tricks, no all caps, 
+  no excessive punctuation or emoji.
+- Relevant to the reader: mention their role, goal, or challenge rather than idare.ai's product name alone.
+- Return only the subject line text, without quotes or labels.
+
+# HTML formatting guidance
+- Produce a single, self-contained HTML email body with inline styles only; no external stylesheets, scripts, 
+  web fonts, tracking pixels, or remote images.
+- Use a simple single-column layout with a readable system font, comfortable line height, and generous spacing.
+- Preserve the wording of the text email exactly; only convert structure such as paragraphs, lists, bold text and 
+  links into the equivalent HTML.
+- Keep colours restrained and ensure good contrast; the email must stay readable if the client strips styles.
+- Return only the HTML, without code fences or commentary.
+
+# How the team works
+Several specialised agents collaborate on each campaign. Sales agents each write a complete draft in their own 
+style. A Sales Manager compares the drafts and selects exactly one. A subject writer proposes the subject line, an 
+HTML converter turns the chosen body into a simple, clean HTML email, and the email is sent. Each agent only 
+performs its own step, follows the rules above, and returns exactly the output its step asks for.
+
+# Your role
+"""
+
 prof_instructions = "You are a sales agent working for idare.ai, \
 a company that provides zero-code predictive analytics solution powered by AI. \
 You write professional, serious cold emails."
@@ -34,100 +143,250 @@ html_instructions = "You can convert a text email body to an HTML email body. \
 You are given a text email body which might have some markdown \
 and you need to convert it to an HTML email body with simple, clear, compelling layout and design."
 
-sales_manager_instructions = """
-You are a Sales Manager at idare.ai. Your goal is to find the single best cold sales email using the sales tools.
-
-Follow these steps carefully:
-1. Generate Drafts: Use all three sales tools (prof_sales, witty_sales, busy_sales) to generate three different email 
-drafts. Do not proceed until all three drafts are ready.
-
-2. Evaluate and Select: Review the drafts and choose the single best email using your judgment of which one is most 
-effective.
+selector_instructions = """
+You are a Sales Manager at idare.ai. Your goal is to pick the single best cold sales email.
 
-3. Handoff for Sending: Pass ONLY the winning email draft to the 'Email Manager' agent. The Email Manager will take 
-care of formatting and sending.
+You are given three email drafts written by different sales agents. Review the drafts and choose the single best 
+email using your judgment of which one is most effective.
 
 Crucial Rules:
-- You must use the sales agent tools to generate the drafts — do not write them yourself.
-- You must hand off exactly ONE email to the Email Manager — never more than one.
+- Do not write a new email or merge drafts — pick exactly ONE of the given drafts.
+- Reply with ONLY the full text of the winning draft, unchanged, with no commentary.
 """
 
-email_manager_instructions =("You are an email formatter and sender. You receive the body of an email to be sent. \
-You first use the subject_writer tool to write a subject for the email, then use the html_converter tool to convert "
-                             "the body to HTML. \
-Finally, you use the send_html_email tool to send the email with the subject and HTML body.")
+
+def with_preamble(instructions: str) -> str:
+    """ Prefix agent-specific instructions with the shared, cacheable company preamble """
+    return company_preamble + instructions.strip()
+
 
 prompt = ("Send out a cold sales email addressed to Dear CTO Dr. Khairul Chowdhury from Kawsar, Data Scientist "
           "at idare.ai")
 
 # --------------------- Create Agents -------------------------
 prof_sales_agent = Agent(name="Professional Sales Agent",
-                         instructions=prof_instructions,
+                         instructions=with_preamble(prof_instructions),
                          model=llm_model)
 
 witty_sales_agent = Agent(name="Engaging Sales Agent",
-                          instructions=witty_instructions,
+                          instructions=with_preamble(witty_instructions),
                           model=llm_model)
 
 busy_sales_agent = Agent(name="Busy Sales Agent",
-                         instructions=busy_instructions,
+                         instructions=with_preamble(busy_instructions),
                          model=llm_model)
 
 subject_writer = Agent(name="Email subject writer",
-                       instructions=subject_instructions,
+                       instructions=with_preamble(subject_instructions),
                        model=llm_model)
 
 html_converter = Agent(name="HTML email body converter",
-                       instructions=html_instructions,
+                       instructions=with_preamble(html_instructions),
+                       model=llm_model)
+
+selector_agent = Agent(name="Sales Manager",
+                       instructions=with_preamble(selector_instructions),
                        model=llm_model)
 
-# --------------------- Create Tools -------------------------
-sales_agent_description = "Write a cold sales email"
-prof_sales = prof_sales_agent.as_tool(tool_name="prof_sales_agent",
-                                      tool_description=sales_agent_description)
-witty_sales = witty_sales_agent.as_tool(tool_name="witty_sales_agent",
-                                        tool_description=sales_agent_description)
-busy_sales = busy_sales_agent.as_tool(tool_name="busy_sales_agent",
-                                      tool_description=sales_agent_description)
-
-subject_tool = subject_writer.as_tool(tool_name="subject_writer",
-                                      tool_description="Write a subject for a cold sales email")
-
-html_tool = html_converter.as_tool(tool_name="html_converter",
-                                   tool_description="Convert a text email body to an HTML email body")
-
-@function_tool
-def send_html_email(subject: str, html_body: str) -> Dict[str, str]:
-    """ Send out an email with the given subject and HTML body to all sales prospects """
-    try:
-        sg = sendgrid.SendGridAPIClient(api_key=os.environ.get('SENDGRID_API_KEY'))
-        from_email = Email(sender_email)  # Change to your verified sender
-        to_email = To(receiver_email)  # Change to your recipient
-        content = Content("text/html", html_body)
-        mail = Mail(from_email, to_email, subject, content).get()
-        sg.client.mail.send.post(request_body=mail)
-        return {"status": "success"}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+# --------------------- LLM helpers -------------------------
+llm_semaphore = asyncio.Semaphore(max_concurrent_llm_calls)
 
-# --------------------- Create Agents -------------------------
-emailer_agent = Agent(name="Email Manager",
-                      instructions=email_manager_instructions,
-                      tools=[subject_tool, html_tool, send_html_email],
-                      model=llm_model,
-                      handoff_description="Convert an email to HTML and send it")
-
-sales_manager = Agent(name="Sales Manager",
-                      instructions=sales_manager_instructions,
-                      tools=[prof_sales, witty_sales, busy_sales],
-                      handoffs=[emailer_agent],
-                      model=llm_model)
+
+async def run_agent(agent: Agent, text: str) -> str:
+    """ Run one agent on the given text, bounded by the LLM semaphore """
+    async with llm_semaphore:
+        result = await Runner.run(agent, text)
+    return result.final_output
+
+# --------------------- Email sending -------------------------
+def require_env(name: str) -> str:
+    """ Read a required environment variable, failing with a clear message if it is unset or blank """
+    value = os.environ.get(name, "").strip()
+    if not value:
+        raise RuntimeError(f"Please set {name} in your environment.")
+    return value
+
+
+def receiver_emails() -> List[str]:
+    """ Prospects from RECEIVER_EMAIL, a comma-separated list, e.g. "a@x.com,b@y.com" """
+    emails = [email.strip() for email in require_env("RECEIVER_EMAIL").split(",") if email.strip()]
+    if not emails:
+        raise RuntimeError("RECEIVER_EMAIL does not contain any email address.")
+    return emails
+
+
+def check_send_config() -> None:
+    """ Fail before any LLM call if sending could not succeed """
+    require_env("SENDER_EMAIL")
+    require_env("SENDGRID_API_KEY")
+    receiver_emails()
+
+
+# one pooled client for all sends, so keep-alive connections skip the TLS handshake
+sendgrid_client = httpx.AsyncClient(http2=True, timeout=30)
+
+sendgrid_semaphore = asyncio.Semaphore(max_concurrent_sends)
+
+# mail/send payload built once at import; each send only fills in the per-message fields
+mail_template = {
+    "from": {"email": sender_email},  # Change to your verified sender
+    "personalizations": None,
+    "subject": None,
+    "content": None,
+}
+
+
+async def post_mail(mail: Dict) -> None:
+    """ POST one mail/send payload, bounded by the SendGrid semaphore """
+    async with sendgrid_semaphore:
+        response = await sendgrid_client.post(sendgrid_send_url,
+                                              content=orjson.dumps(mail),
+                                              headers={"Authorization": f"Bearer {require_env('SENDGRID_API_KEY')}",
+                                                       "Content-Type": "application/json"})
+    if response.is_error:
+        # keep SendGrid's own error body, it says which field or limit was rejected
+        raise RuntimeError(f"SendGrid returned {response.status_code}: {response.text}")
+
+
+async def send_html_email(subject: str, html_body: str, recipients: List[str]) -> Dict:
+    """ Send out an email with the given subject and HTML body to all sales prospects.
+    Returns the overall status ("success", "partial" or "error") plus per-batch recipients, status and errors """
+    if not recipients:
+        return {"status": "error", "message": "No recipients: set RECEIVER_EMAIL to one or more addresses",
+                "batches": []}
+    # one personalization per recipient, so each prospect only sees their own address
+    personalizations = [{"to": [{"email": recipient}]} for recipient in recipients]
+    batches = [personalizations[i:i + sendgrid_max_personalizations]
+               for i in range(0, len(personalizations), sendgrid_max_personalizations)]
+    # subject and content are shared by every batch; only the personalizations differ
+    message = {**mail_template, "subject": subject, "content": [{"type": "text/html", "value": html_body}]}
+    mails = [{**message, "personalizations": batch} for batch in batches]
+    # batches are independent: one failure must not cancel the others mid-flight,
+    # and the caller needs to know exactly which recipients were sent to
+    outcomes = await asyncio.gather(*[post_mail(mail) for mail in mails], return_exceptions=True)
+    batch_results = []
+    for i, (batch, outcome) in enumerate(zip(batches, outcomes)):
+        result = {"batch": i, "recipients": [p["to"][0]["email"] for p in batch]}
+        if isinstance(outcome, BaseException):
+            result.update(status="error", message=str(outcome) or type(outcome).__name__)
+        else:
+            result["status"] = "success"
+        batch_results.append(result)
+
+    failed = sum(result["status"] == "error" for result in batch_results)
+    if failed == 0:
+        status = "success"
+    elif failed == len(batch_results):
+        status = "error"
+    else:
+        status = "partial"
+    return {"status": status, "batches": batch_results}
+
+
+async def finalize_and_send(body: str) -> Dict:
+    """ Write the subject and the HTML body concurrently, then send the email """
+    # subject and HTML both depend only on the body, so the two LLM calls can overlap
+    async with asyncio.TaskGroup() as tg:
+        subject = tg.create_task(run_agent(subject_writer, body))
+        html_body = tg.create_task(run_agent(html_converter, body))
+    return await send_html_email(subject.result(), html_body.result(), receiver_emails())
+
+
+# --------------------- offline batch drafting ----------------
+async def batch_drafts(prospect_prompts: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """ Draft all three variants for every prospect via the OpenAI Batch API (50% cheaper, not realtime).
+    Returns (drafts, failures), both keyed by custom_id, e.g. "prospect_0_witty"; failures map to error messages """
+    variants = {"prof": with_preamble(prof_instructions),
+                "witty": with_preamble(witty_instructions),
+                "busy": with_preamble(busy_instructions)}
+    custom_ids = []
+    lines = []
+    for i, prospect_prompt in enumerate(prospect_prompts):
+        for variant, instructions in variants.items():
+            custom_ids.append(f"prospect_{i}_{variant}")
+            lines.append(orjson.dumps({"custom_id": custom_ids[-1],
+                                       "method": "POST",
+                                       "url": "/v1/chat/completions",
+                                       "body": {"model": llm_model,
+                                                "messages": [{"role": "system", "content": instructions},
+                                                             {"role": "user", "content": prospect_prompt}]}}))
+    batch_file = await openai_client.files.create(file=("drafts.jsonl", b"\n".join(lines)),
+                                                  purpose="batch")
+    batch = await openai_client.batches.create(input_file_id=batch_file.id,
+                                               endpoint="/v1/chat/completions",
+                                               completion_window="24h")
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(batch_poll_seconds)
+        batch = await openai_client.batches.retrieve(batch.id)
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} finished with status {batch.status}")
+
+    drafts, failures = {}, {}
+    # successful requests land in the output file, failed ones in the error file
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = await openai_client.files.content(file_id)
+        for line in content.text.splitlines():
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                drafts[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+            else:
+                error = record.get("error") or response.get("body", {}).get("error") or {}
+                failures[record["custom_id"]] = error.get("message") or f"HTTP {response.get('status_code')}"
+    for custom_id in custom_ids:
+        if custom_id not in drafts and custom_id not in failures:
+            failures[custom_id] = "missing from batch output"
+    return drafts, failures
+
+
+async def offline_main(prospects_path: str) -> int:
+    """ Draft every prospect in the file (one request prompt per line) and print the drafts as JSON lines """
+    with open(prospects_path, encoding="utf-8") as f:
+        prospect_prompts = [line.strip() for line in f if line.strip()]
+    if not prospect_prompts:
+        print(f"[!] No prospect prompts found in {prospects_path}; nothing to draft.", file=sys.stderr)
+        return 1
+    drafts, failures = await batch_drafts(prospect_prompts)
+    for custom_id, draft in drafts.items():
+        print(orjson.dumps({"custom_id": custom_id, "draft": draft}).decode("utf-8"))
+    for custom_id, message in failures.items():
+        print(f"[!] {custom_id} failed: {message}", file=sys.stderr)
+    return 1 if failures else 0
 
 # --------------------- main ----------------------------------
+# Static plan: the three drafters share a rank and run concurrently, then selection, then finalize and send.
+# Only the selection step needs LLM judgement, so no planner agent decides the order of steps.
+drafting_agents = [prof_sales_agent, witty_sales_agent, busy_sales_agent]
+
+
+def format_choices(drafts: List[str]) -> str:
+    """ Lay out the drafts as numbered choices for the selector agent """
+    return "\n\n".join(f"Draft {i}:\n{draft}" for i, draft in enumerate(drafts, start=1))
+
+
+async def run_campaign(query: str) -> Dict:
+    """ Draft, select, finalize and send one cold email for the given request """
+    # a failure in one draft cancels the others instead of leaving them running
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(run_agent(agent, query)) for agent in drafting_agents]
+    winner = await run_agent(selector_agent, format_choices([task.result() for task in tasks]))
+    return await finalize_and_send(winner)
+
+
 async def main(query: str):
+    check_send_config()
     with trace("Automated SDR"):
-        result = await Runner.run(sales_manager, query)
+        result = await run_campaign(query)
         print(result)
 
 if __name__ == "__main__":
-    asyncio.run(main(prompt))
+    parser = argparse.ArgumentParser(description="Automated SDR cold-email workflow")
+    parser.add_argument("--offline", metavar="PROSPECTS_FILE",
+                        help="draft emails for every prompt in the file via the OpenAI Batch API instead of sending")
+    args = parser.parse_args()
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop else None) as runner:
+        if args.offline:
+            sys.exit(runner.run(offline_main(args.offline)))
+        runner.run(main(prompt))
@@ -2,31 +2,56 @@
 Hybrid Search Agent using OpenAI Agent SDK, ChromaDB, and OpenAI built‑in web_search tool.
 
 Requirements:
-    pip install openai chromadb python-dotenv
+    pip install openai chromadb python-dotenv "httpx[http2]" orjson
+    pip install sqlite-vec   # optional, faster vector search; falls back to Chroma
+    pip install uvloop       # optional, faster event loop on Linux/macOS
+
+Python 3.11+ is required.
 
 Environment variables required:
     OPENAI_API_KEY – your OpenAI key
 
+Environment variables optional:
+    CHROMA_HOST / CHROMA_PORT – Chroma server address (default localhost:8000)
+
 Internal index location:
-    A persistent ChromaDB database will be created at ./internal_index
+    A ChromaDB server persists the collection at ./internal_index
+    (collection "internal_docs_text-embedding-3-small")
+    Query embeddings are cached across runs in ./internal_index/_embed_cache.sqlite
+    Chat completions are cached across runs in ./internal_index/_llm_cache.sqlite
 
 Run:
+    chroma run --path ./internal_index   # in a separate terminal
     python hybrid_search_agent.py
 
-The script exposes one helper function `chat(query)` that automatically decides
-when to call `internal_search` (Chroma) or `web_search` (OpenAI built‑in), or both,
+The script exposes one coroutine `chat(query)` that automatically decides
+when to call `fts_search` (fast keyword), `vector_search` (Chroma / sqlite-vec)
+or `web_search` (OpenAI built‑in), or several of them,
  to answer the user’s question. Replace the Chroma ingestion example at the bottom
 with your own documents.
 """
 
 import os
-import json
+import asyncio
+import hashlib
+import sqlite3
+from collections import OrderedDict
+from contextvars import ContextVar
 from typing import List, Dict
 
 import chromadb
-from chromadb.config import Settings
+import httpx
+import numpy as np
+import orjson
+from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+
+try:
+    import uvloop
+except ImportError:  # optional; not available on Windows
+    uvloop = None
 
 # ---------------------------------------------------------------------------
 # Environment & keys
@@ -36,35 +61,437 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("Please set OPENAI_API_KEY in your environment.")
 
-client = OpenAI()
+# One pooled HTTP/2 client shared by every OpenAI call (chat + embeddings), so
+# connections are reused and concurrent requests multiplex over them.
+_http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(60.0),
+)
+async_client = AsyncOpenAI(http_client=_http_client)
 
 # ---------------------------------------------------------------------------
 # ChromaDB setup
 # ---------------------------------------------------------------------------
-chroma_client = chromadb.PersistentClient(
-    path="internal_index",
-    settings=Settings(allow_reset=True),
+EMBEDDING_MODEL = "text-embedding-3-small"
+embedding_fn = OpenAIEmbeddingFunction(api_key=OPENAI_API_KEY, model_name=EMBEDDING_MODEL)
+
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+# The collection name carries the embedding model: vectors from different models
+# (e.g. Chroma's default 384-d MiniLM) can never be mixed with these 1536-d ones.
+# Documents in the older "internal_docs" collection are re-embedded on first start.
+CHROMA_COLLECTION = f"internal_docs_{EMBEDDING_MODEL}"
+LEGACY_CHROMA_COLLECTION = "internal_docs"
+
+_chroma_client = None
+_collection = None
+
+
+async def get_chroma_client():
+    """Connect to the Chroma server once and return the shared async client."""
+    global _chroma_client
+    if _chroma_client is None:
+        _chroma_client = await chromadb.AsyncHttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+    return _chroma_client
+
+
+async def get_collection():
+    """Return the shared async collection for the current embedding model."""
+    global _collection
+    if _collection is None:
+        chroma_client = await get_chroma_client()
+        _collection = await chroma_client.get_or_create_collection(
+            CHROMA_COLLECTION, embedding_function=embedding_fn
+        )
+    return _collection
+
+
+# ---------------------------------------------------------------------------
+# sqlite-vec setup (optional fast path, mirrors the Chroma collection)
+# ---------------------------------------------------------------------------
+EMBEDDING_DIM = 1536  # text-embedding-3-small
+VEC_DB_PATH = os.path.join("internal_index", "vectors.sqlite")
+
+os.makedirs(os.path.dirname(VEC_DB_PATH), exist_ok=True)
+vec_db = sqlite3.connect(VEC_DB_PATH, check_same_thread=False)
+try:
+    import sqlite_vec
+
+    vec_db.enable_load_extension(True)
+    sqlite_vec.load(vec_db)
+    vec_db.enable_load_extension(False)
+    vec_db.execute(
+        "CREATE TABLE IF NOT EXISTS vec_docs (rowid INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, text TEXT NOT NULL)"
+    )
+    # int8 embeddings are 4x smaller than float32; cosine distance ignores the
+    # per-vector scale, so it does not need to be stored
+    vec_db.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS vec_chunks_int8 USING "
+        f"vec0(embedding int8[{EMBEDDING_DIM}] distance_metric=cosine)"
+    )
+    # float32 table from earlier versions; its rows are rebuilt into vec_chunks_int8
+    vec_db.execute("DROP TABLE IF EXISTS vec_chunks")
+    vec_db.commit()
+    VEC_ENABLED = True
+except (ImportError, AttributeError, sqlite3.Error) as exc:
+    print(f"[!] sqlite-vec unavailable ({exc}); using Chroma for vector search.")
+    VEC_ENABLED = False
+
+
+# Full-text index over the same documents; FTS5 ships with the stdlib sqlite3.
+vec_db.execute(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(doc_id UNINDEXED, text)"
 )
-collection = chroma_client.get_or_create_collection("internal_docs")
+vec_db.commit()
+
+
+def quantize_int8(vec: List[float]) -> bytes:
+    """Scale a vector so its largest component maps to ±127 and round to int8."""
+    v = np.asarray(vec, dtype=np.float32)
+    scale = float(np.abs(v).max()) or 1.0
+    return np.clip(np.round(v * 127 / scale), -127, 127).astype(np.int8).tobytes()
+
+
+CHROMA_PAGE_SIZE = 5000  # records per collection.get() page when rebuilding local indexes
+
+
+async def _iter_chroma_pages(include: List[str], collection=None, page_size: int = CHROMA_PAGE_SIZE):
+    """Yield a whole Chroma collection (by default the current one) page by page."""
+    collection = collection or await get_collection()
+    offset = 0
+    while True:
+        page = await collection.get(include=include, limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+# Serializes every write to the local mirrors on vec_db (index rebuilds and ingest),
+# so two writers never share, commit or roll back each other's open transaction.
+_index_sync_lock = asyncio.Lock()
+_fts_synced = False
+
 
+async def _ensure_fts_synced() -> None:
+    """Rebuild docs_fts from Chroma if it does not hold every document (e.g. an index
+    created before full-text search existed). Call with _index_sync_lock held."""
+    global _fts_synced
+    if _fts_synced:
+        return
+    (count,) = vec_db.execute("SELECT COUNT(*) FROM docs_fts").fetchone()
+    collection = await get_collection()
+    if count != await collection.count():
+        try:
+            vec_db.execute("DELETE FROM docs_fts")
+            async for page in _iter_chroma_pages(["documents"]):
+                vec_db.executemany(
+                    "INSERT INTO docs_fts (doc_id, text) VALUES (?, ?)",
+                    zip(page["ids"], page["documents"]),
+                )
+            vec_db.commit()
+        except BaseException:
+            vec_db.rollback()
+            raise
+    _fts_synced = True
 
-def ingest_documents(docs: List[str]) -> None:
-    """Add raw text documents to the Chroma collection."""
+
+_vec_synced = False
+
+
+async def _ensure_vec_synced() -> None:
+    """Rebuild the int8 sqlite-vec store from Chroma's stored embeddings if it does not
+    hold every document (e.g. an index from before sqlite-vec or int8 quantization).
+    Call with _index_sync_lock held."""
+    global VEC_ENABLED, _vec_synced
+    if not VEC_ENABLED or _vec_synced:
+        return
+    (count,) = vec_db.execute("SELECT COUNT(*) FROM vec_chunks_int8").fetchone()
+    collection = await get_collection()
+    if count != await collection.count():
+        print("[+] Rebuilding the sqlite-vec index from ChromaDB…")
+        try:
+            vec_db.execute("DELETE FROM vec_chunks_int8")
+            vec_db.execute("DELETE FROM vec_docs")
+            async for page in _iter_chroma_pages(["documents", "embeddings"]):
+                for doc_id, doc_text, vec in zip(page["ids"], page["documents"], page["embeddings"]):
+                    cur = vec_db.execute(
+                        "INSERT INTO vec_docs (doc_id, text) VALUES (?, ?)", (doc_id, doc_text)
+                    )
+                    vec_db.execute(
+                        "INSERT INTO vec_chunks_int8 (rowid, embedding) VALUES (?, vec_int8(?))",
+                        (cur.lastrowid, quantize_int8(vec)),
+                    )
+            vec_db.commit()
+        except sqlite3.Error as exc:
+            vec_db.rollback()
+            print(f"[!] Could not rebuild sqlite-vec index ({exc}); using Chroma for vector search.")
+            VEC_ENABLED = False
+        except BaseException:
+            # includes cancellation: never leave the DELETEs pending for a later commit
+            vec_db.rollback()
+            raise
+    _vec_synced = True
+
+
+async def sync_local_indexes() -> None:
+    """Bring docs_fts and sqlite-vec level with Chroma; a no-op after the first success.
+
+    The REPL runs this once at startup. Search tools call it through asyncio.shield,
+    so cancelling a search (e.g. an unused prefetch) never interrupts a rebuild.
+    """
+    async with _index_sync_lock:
+        await _ensure_fts_synced()
+        await _ensure_vec_synced()
+
+
+EMBED_BATCH_SIZE = 2048  # max inputs per OpenAI embeddings request
+EMBED_CONCURRENCY = 4  # max embeddings requests in flight during ingestion
+
+
+async def embed_documents(docs: List[str]) -> List[List[float]]:
+    """Embed documents in concurrent batches, preserving input order."""
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+    async def embed_batch(batch: List[str]) -> List[List[float]]:
+        async with semaphore:
+            res = await async_client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
+        return [item.embedding for item in sorted(res.data, key=lambda item: item.index)]
+
+    batches = [docs[i:i + EMBED_BATCH_SIZE] for i in range(0, len(docs), EMBED_BATCH_SIZE)]
+    results = await asyncio.gather(*[embed_batch(batch) for batch in batches])
+    return [vec for batch in results for vec in batch]
+
+
+# Every add is one JSON request to the Chroma server; 500 x 1536 floats keeps a body
+# around 15 MB, far below what the server's own max batch size would allow.
+CHROMA_HTTP_ADD_BATCH_SIZE = 500
+
+
+async def chroma_add_batch_size() -> int:
+    """Documents per collection.add(): the server's limit, capped for HTTP body size."""
+    chroma_client = await get_chroma_client()
+    return min(await chroma_client.get_max_batch_size(), CHROMA_HTTP_ADD_BATCH_SIZE)
+
+
+async def ingest_documents(docs: List[str]) -> None:
+    """Add raw text documents to the Chroma collection (and sqlite-vec, if available).
+
+    Documents are embedded and written one batch at a time, so peak memory is bounded
+    by the batch size rather than the corpus; the next batch is embedded while the
+    current one is being written.
+    """
     import uuid
-    collection.add(
-        documents=docs,
-        ids=[str(uuid.uuid4()) for _ in docs],
-        metadatas=[{} for _ in docs],
+    collection = await get_collection()
+    batch_size = await chroma_add_batch_size()
+    empty_metadata = {}  # shared: Chroma serializes metadata on add, never mutates it
+    starts = range(0, len(docs), batch_size)
+    next_embeddings = asyncio.create_task(embed_documents(docs[:batch_size])) if docs else None
+    try:
+        for start in starts:
+            batch_docs = docs[start:start + batch_size]
+            batch_embeddings = await next_embeddings
+            following = docs[start + batch_size:start + 2 * batch_size]
+            next_embeddings = asyncio.create_task(embed_documents(following)) if following else None
+            batch_ids = [uuid.uuid4().hex for _ in batch_docs]
+            await collection.add(
+                documents=batch_docs,
+                embeddings=batch_embeddings,
+                ids=batch_ids,
+                metadatas=[empty_metadata] * len(batch_docs),
+            )
+            async with _index_sync_lock:
+                try:
+                    vec_db.executemany(
+                        "INSERT INTO docs_fts (doc_id, text) VALUES (?, ?)", zip(batch_ids, batch_docs)
+                    )
+                    if VEC_ENABLED:
+                        for doc_id, doc_text, vec in zip(batch_ids, batch_docs, batch_embeddings):
+                            cur = vec_db.execute(
+                                "INSERT INTO vec_docs (doc_id, text) VALUES (?, ?)", (doc_id, doc_text)
+                            )
+                            vec_db.execute(
+                                "INSERT INTO vec_chunks_int8 (rowid, embedding) VALUES (?, vec_int8(?))",
+                                (cur.lastrowid, quantize_int8(vec)),
+                            )
+                    vec_db.commit()
+                except BaseException:
+                    vec_db.rollback()
+                    raise
+    finally:
+        if next_embeddings is not None:
+            next_embeddings.cancel()
+
+
+async def migrate_legacy_collection() -> None:
+    """Re-embed documents from the pre-OpenAI-embeddings collection into the current one.
+
+    Runs only while the current collection is empty; the legacy collection is left
+    untouched so nothing is lost if the migration is interrupted.
+    """
+    collection = await get_collection()
+    if await collection.count() > 0:
+        return
+    chroma_client = await get_chroma_client()
+    try:
+        legacy = await chroma_client.get_collection(LEGACY_CHROMA_COLLECTION)
+    except Exception:  # not found; the exception type differs across Chroma versions
+        return
+    legacy_count = await legacy.count()
+    if legacy_count == 0:
+        return
+
+    print(f"[+] Re-embedding {legacy_count} documents from legacy collection "
+          f"'{LEGACY_CHROMA_COLLECTION}' into '{CHROMA_COLLECTION}'…")
+    async for page in _iter_chroma_pages(
+        ["documents", "metadatas"], collection=legacy, page_size=await chroma_add_batch_size()
+    ):
+        await collection.add(
+            documents=page["documents"],
+            embeddings=await embed_documents(page["documents"]),
+            ids=page["ids"],
+            metadatas=page["metadatas"],
+        )
+    print("[+] Legacy documents migrated.")
+
+
+# ---------------------------------------------------------------------------
+# Query embedding cache (in-memory LRU in front of a persistent SQLite store)
+# ---------------------------------------------------------------------------
+EMBED_CACHE_SIZE = 4096
+EMBED_CACHE_PATH = os.path.join("internal_index", "_embed_cache.sqlite")
+_embed_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+_embed_db = sqlite3.connect(EMBED_CACHE_PATH, check_same_thread=False)
+_embed_db.execute(
+    "CREATE TABLE IF NOT EXISTS query_embeddings (qhash TEXT PRIMARY KEY, vec BLOB NOT NULL)"
+)
+_embed_db.commit()
+
+
+def _remember_embedding(key: str, vec: List[float]) -> None:
+    _embed_cache[key] = vec
+    if len(_embed_cache) > EMBED_CACHE_SIZE:
+        _embed_cache.popitem(last=False)  # evict least recently used
+
+
+async def embed_query(query: str) -> List[float]:
+    """Embed a query, reusing the vector of any previously seen identical query."""
+    normalized = query.strip().lower()
+    # the model name is part of the key so switching models never serves stale vectors
+    key = hashlib.sha256(f"{EMBEDDING_MODEL}:{normalized}".encode("utf-8")).hexdigest()
+    if key in _embed_cache:
+        _embed_cache.move_to_end(key)
+        return _embed_cache[key]
+
+    row = _embed_db.execute(
+        "SELECT vec FROM query_embeddings WHERE qhash = ?", (key,)
+    ).fetchone()
+    if row is not None:
+        vec = np.frombuffer(row[0], dtype=np.float32).tolist()
+        _remember_embedding(key, vec)
+        return vec
+
+    # normalization only shapes the cache key; embed the text as the user wrote it
+    res = await async_client.embeddings.create(model=EMBEDDING_MODEL, input=[query.strip()])
+    vec = res.data[0].embedding
+    _embed_db.execute(
+        "INSERT OR REPLACE INTO query_embeddings (qhash, vec) VALUES (?, ?)",
+        (key, np.asarray(vec, dtype=np.float32).tobytes()),
     )
+    _embed_db.commit()
+    _remember_embedding(key, vec)
+    return vec
 
 
 # ---------------------------------------------------------------------------
 # Tool implementations
 # ---------------------------------------------------------------------------
 
-def internal_search_tool(query: str, top_k: int = 5) -> List[Dict]:
-    """Search internal ChromaDB for relevant documents."""
-    res = collection.query(query_texts=[query], n_results=top_k)
+def _fts_match_expr(query: str) -> str:
+    """Quote every term so user punctuation is never parsed as FTS5 syntax."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    return " OR ".join(terms)
+
+
+# Vector searches started in the background by fts_search, keyed by (query, top_k).
+# Each chat() call installs its own dict, so concurrent sessions never touch each
+# other's prefetches; outside chat() there is no dict and nothing is prefetched.
+_pending_vector_searches: ContextVar[Dict[tuple, asyncio.Task] | None] = ContextVar(
+    "pending_vector_searches", default=None
+)
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # mark a failed prefetch as handled even if vector_search never awaits it
+    if not task.cancelled():
+        task.exception()
+
+
+def _prefetch_vector_search(query: str, top_k: int) -> None:
+    pending = _pending_vector_searches.get()
+    key = (query, top_k)
+    if pending is not None and key not in pending:
+        pending[key] = asyncio.create_task(_vector_search(query, top_k))
+        pending[key].add_done_callback(_retrieve_exception)
+
+
+async def fts_search_tool(query: str, top_k: int = 5) -> List[Dict]:
+    """Fast keyword search over internal documents (SQLite FTS5, BM25 ranking).
+
+    Also starts the slower semantic search for the same query in the background,
+    so a follow-up `vector_search` call only waits for whatever is left of it.
+    """
+    await asyncio.shield(sync_local_indexes())
+    _prefetch_vector_search(query, top_k)
+    match = _fts_match_expr(query)
+    if not match:
+        return []
+    rows = vec_db.execute(
+        "SELECT doc_id, text, bm25(docs_fts) AS score FROM docs_fts "
+        "WHERE docs_fts MATCH ? ORDER BY score LIMIT ?",
+        (match, top_k),
+    ).fetchall()
+    return [
+        {"rank": rank, "id": doc_id, "text": doc_text, "score": score}
+        for rank, (doc_id, doc_text, score) in enumerate(rows, start=1)
+    ]
+
+
+async def vector_search_tool(query: str, top_k: int = 5) -> List[Dict]:
+    """Semantic search over internal documents, reusing a prefetched search if any."""
+    pending = _pending_vector_searches.get()
+    task = pending.pop((query, top_k), None) if pending is not None else None
+    if task is not None:
+        return await task
+    return await _vector_search(query, top_k)
+
+
+async def _vector_search(query: str, top_k: int = 5) -> List[Dict]:
+    """Search internal documents via sqlite-vec, falling back to ChromaDB."""
+    query_vec = await embed_query(query)
+    await asyncio.shield(sync_local_indexes())
+    if VEC_ENABLED and _vec_synced:
+        rows = vec_db.execute(
+            """
+            SELECT d.doc_id, d.text, v.distance
+            FROM (
+                SELECT rowid, distance FROM vec_chunks_int8
+                WHERE embedding MATCH vec_int8(?) ORDER BY distance LIMIT ?
+            ) AS v
+            JOIN vec_docs AS d ON d.rowid = v.rowid
+            ORDER BY v.distance
+            """,
+            (quantize_int8(query_vec), top_k),
+        ).fetchall()
+        return [
+            {"rank": rank, "id": doc_id, "text": doc_text, "score": score}
+            for rank, (doc_id, doc_text, score) in enumerate(rows, start=1)
+        ]
+
+    collection = await get_collection()
+    res = await collection.query(query_embeddings=[query_vec], n_results=top_k)
     hits = []
     for rank, (doc_id, doc_text, score) in enumerate(
         zip(res["ids"][0], res["documents"][0], res["distances"][0]), start=1
@@ -76,31 +503,47 @@ def internal_search_tool(query: str, top_k: int = 5) -> List[Dict]:
 # ---------------------------------------------------------------------------
 # OpenAI function‑tool specifications
 # ---------------------------------------------------------------------------
-internal_search_spec = {
-    "name": "internal_search",
-    "description": "Searches the internal ChromaDB vector store for relevant documents.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "query": {"type": "string", "description": "The user search query."},
-            "top_k": {
-                "type": "integer",
-                "description": "Maximum number of results to return (default 5).",
-                "default": 5,
-            },
+_search_parameters = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string", "description": "The user search query."},
+        "top_k": {
+            "type": "integer",
+            "description": "Maximum number of results to return (default 5).",
+            "default": 5,
         },
-        "required": ["query"],
     },
+    "required": ["query"],
+}
+
+fts_search_spec = {
+    "name": "fts_search",
+    "description": "Fast keyword search over internal documents. Call this first; "
+    "use vector_search only if the keyword hits are not enough.",
+    "parameters": _search_parameters,
+}
+
+vector_search_spec = {
+    "name": "vector_search",
+    "description": "Slower semantic search over the internal vector store for relevant documents.",
+    "parameters": _search_parameters,
 }
 
 # Built‑in web_search tool – no schema needed beyond type declaration
 web_search_spec = {"type": "web_search"}
 
 
-def dispatch_tool_call(call) -> List[Dict]:
+LOCAL_TOOLS = {
+    "fts_search": fts_search_tool,
+    "vector_search": vector_search_tool,
+}
+
+
+async def dispatch_tool_call(call) -> List[Dict]:
     """Executes Python-side tools. Built‑in tools are handled by OpenAI."""
-    if call["name"] == "internal_search":
-        return internal_search_tool(**call.get("arguments", {}))
+    if call.function.name in LOCAL_TOOLS:
+        arguments = orjson.loads(call.function.arguments or "{}")
+        return await LOCAL_TOOLS[call.function.name](**arguments)
     # Any other tool (e.g., web_search) is handled by the platform
     return []
 
@@ -109,73 +552,134 @@ def dispatch_tool_call(call) -> List[Dict]:
 # Chat loop with automatic tool use
 # ---------------------------------------------------------------------------
 
-def chat(query: str, history: List[Dict] | None = None, model: str = "gpt-4o-mini") -> str:
+CHAT_TOOLS = [
+    {"type": "function", "function": fts_search_spec},
+    {"type": "function", "function": vector_search_spec},
+    web_search_spec,
+]
+CHAT_TEMPERATURE = 0.3
+LLM_CACHE_PATH = os.path.join("internal_index", "_llm_cache.sqlite")
+
+_llm_cache_db = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False)
+_llm_cache_db.execute(
+    "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, response TEXT NOT NULL)"
+)
+_llm_cache_db.commit()
+
+
+def _jsonable(obj):
+    """orjson.dumps fallback: history may hold SDK message objects, not just dicts."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(exclude_none=True)
+    return str(obj)
+
+
+async def cached_completion(model: str, messages: List[Dict]) -> ChatCompletion:
+    """Chat completion, served from the on-disk cache for an identical request."""
+    key = hashlib.sha256(
+        orjson.dumps(
+            {"m": model, "msgs": messages, "t": CHAT_TOOLS, "T": CHAT_TEMPERATURE},
+            option=orjson.OPT_SORT_KEYS,
+            default=_jsonable,
+        )
+    ).hexdigest()
+    row = _llm_cache_db.execute(
+        "SELECT response FROM completions WHERE key = ?", (key,)
+    ).fetchone()
+    if row is not None:
+        return ChatCompletion.model_validate_json(row[0])
+
+    response = await async_client.chat.completions.create(
+        model=model,
+        messages=messages,
+        tools=CHAT_TOOLS,
+        tool_choice="auto",
+        temperature=CHAT_TEMPERATURE,
+    )
+    _llm_cache_db.execute(
+        "INSERT OR REPLACE INTO completions (key, response) VALUES (?, ?)",
+        (key, response.model_dump_json()),
+    )
+    _llm_cache_db.commit()
+    return response
+
+
+async def chat(query: str, history: List[Dict] | None = None, model: str = "gpt-4o-mini") -> str:
     """Chat with the assistant. It will decide when to call tools automatically."""
     history = history or []
     history.append({"role": "user", "content": query})
 
-    while True:
-        response = client.chat.completions.create(
-            model=model,
-            messages=history,
-            tools=[
-                {"type": "function", "function": internal_search_spec},
-                web_search_spec,
-            ],
-            tool_choice="auto",
-            temperature=0.3,
-        )
+    pending: Dict[tuple, asyncio.Task] = {}
+    token = _pending_vector_searches.set(pending)
+    try:
+        while True:
+            response = await cached_completion(model, history)
 
-        msg = response.choices[0].message
+            msg = response.choices[0].message
 
-        # Assistant wants to call a tool
-        if msg.tool_calls:
-            history.append(msg)  # keep the assistant's tool_call message
-            for call in msg.tool_calls:
-                # only dispatch internal_search locally
-                if call.name == "internal_search":
-                    result = dispatch_tool_call(call)
+            # Assistant wants to call a tool
+            if msg.tool_calls:
+                history.append(msg)  # keep the assistant's tool_call message
+                # only dispatch local search tools here; run all such calls concurrently
+                local_calls = [call for call in msg.tool_calls if call.function.name in LOCAL_TOOLS]
+                results = await asyncio.gather(*[dispatch_tool_call(call) for call in local_calls])
+                for call, result in zip(local_calls, results):
                     history.append(
                         {
                             "role": "tool",
                             "tool_call_id": call.id,
-                            "name": call.name,
-                            "content": json.dumps(result, ensure_ascii=False),
+                            "name": call.function.name,
+                            "content": orjson.dumps(result).decode("utf-8"),
                         }
                     )
-            # Loop again so the model can incorporate tool results
-            continue
+                # Loop again so the model can incorporate tool results
+                continue
 
-        # Tool message returned from OpenAI (e.g., for web_search)
-        if msg.role == "tool":
-            history.append(msg)
-            continue
+            # Tool message returned from OpenAI (e.g., for web_search)
+            if msg.role == "tool":
+                history.append(msg)
+                continue
 
-        # Final assistant answer
-        history.append({"role": "assistant", "content": msg.content})
-        return msg.content
+            # Final assistant answer
+            history.append({"role": "assistant", "content": msg.content})
+            return msg.content
+    finally:
+        # drop this call's prefetched vector searches that nobody asked for
+        for task in pending.values():
+            task.cancel()
+        _pending_vector_searches.reset(token)
 
 
 # ---------------------------------------------------------------------------
 # Example ingestion & REPL
 # ---------------------------------------------------------------------------
-if __name__ == "__main__":
+async def ingest_sample_docs() -> None:
+    await migrate_legacy_collection()
+    await sync_local_indexes()
     # Index sample docs if collection is empty
-    if collection.count() == 0:
+    collection = await get_collection()
+    if await collection.count() == 0:
         sample_docs = [
             "OpenAI released GPT-4o in 2025, offering multimodal capabilities.",
             "IDARE AI's AutoML platform simplifies model training on AWS S3 data.",
         ]
-        ingest_documents(sample_docs)
+        await ingest_documents(sample_docs)
         print("[+] Sample documents ingested into ChromaDB for demo…")
 
-    print("\nHybrid Search Agent – type your question (Ctrl-C to exit):\n")
-    try:
-        while True:
-            user_q = input("> ").strip()
-            if not user_q:
-                continue
-            answer = chat(user_q)
-            print("\nAssistant:\n", answer, "\n")
-    except KeyboardInterrupt:
-        print("\nGoodbye!")
+
+if __name__ == "__main__":
+    # One event loop for the whole session (the Chroma and OpenAI clients are bound
+    # to it); input() stays outside it, so Ctrl-C exits immediately.
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop else None) as runner:
+        runner.run(ingest_sample_docs())
+
+        print("\nHybrid Search Agent – type your question (Ctrl-C to exit):\n")
+        try:
+            while True:
+                user_q = input("> ").strip()
+                if not user_q:
+                    continue
+                answer = runner.run(chat(user_q))
+                print("\nAssistant:\n", answer, "\n")
+        except KeyboardInterrupt:
+            print("\nGoodbye!")